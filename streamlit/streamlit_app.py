@@ -3,15 +3,22 @@ LoadStar Commander — Freight intelligence dashboard.
 Runs on Snowflake Container Runtime (SPCS).
 """
 
+import bisect
+import functools
 import json
+import math
 import os
 import re as _re
 
+import numpy as np
+import orjson
 import pandas as pd
 import pydeck as pdk
-import plotly.graph_objects as go
 import requests
 import sseclient
+import streamlit.components.v1 as components
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 import streamlit as st
 
@@ -95,6 +102,11 @@ html, body, [class*="st-"] {
     text-transform: uppercase;
     letter-spacing: 0.05em;
 }
+.stat-row {
+    display: flex;
+    gap: 16px;
+}
+.stat-row .stat-card { flex: 1 1 0; min-width: 0; }
 
 /* Risk badge */
 .risk-badge {
@@ -122,6 +134,16 @@ html, body, [class*="st-"] {
                 inset -3px -3px 6px var(--shadow-light);
 }
 
+/* Match engine recommendation row (gauge | load | rate | broker) */
+.rec-row {
+    display: grid;
+    grid-template-columns: 1fr 2fr 2fr 1fr;
+    align-items: center;
+    gap: 12px;
+}
+.rec-row .rec-title { font-weight: 600; color: var(--text-header); }
+.rec-row .rec-sub { font-size: 0.8rem; color: var(--text-secondary); margin-top: 2px; }
+
 /* Section header */
 .section-header {
     font-size: 1.1rem;
@@ -253,7 +275,17 @@ html, body, [class*="st-"] {
 }
 </style>
 """
-st.html(NEUMORPH_CSS)
+
+
+@st.cache_resource
+def minified_css(css: str) -> str:
+    """Strip comments and whitespace once per process; the CSS is re-sent on every rerun."""
+    css = _re.sub(r"/\*.*?\*/", "", css, flags=_re.DOTALL)
+    css = _re.sub(r"\s+", " ", css)
+    return _re.sub(r"\s*([{};,>])\s*", r"\1", css).strip()
+
+
+st.html(minified_css(NEUMORPH_CSS))
 
 
 # ---------------------------------------------------------------------------
@@ -264,15 +296,53 @@ def get_session():
     return st.connection("snowflake").session()
 
 
-@st.cache_data(ttl=300)
-def run_query(sql: str) -> pd.DataFrame:
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """Shared HTTP session so Cortex Agent calls reuse TCP/TLS connections."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=4,
+        max_retries=Retry(total=2, backoff_factor=0.2),
+    )
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_data(ttl=240)
+def read_session_token() -> str:
+    """SPCS OAuth token, re-read every few minutes rather than per request."""
+    with open("/snowflake/session/token", "r") as f:
+        return f.read()
+
+
+def run_query(sql: str, params: tuple | None = None) -> pd.DataFrame:
+    """Run SQL on the session's connector cursor and materialize via Arrow.
+
+    ``params`` are bound by the connector (``%s`` placeholders), never
+    interpolated into the SQL text.
+
+    Uncached on purpose: each loader below caches its own result, so caching
+    here too would only hash the SQL text a second time.
+    Skips the Snowpark DataFrame layer; ``self_destruct`` frees each Arrow
+    buffer as it is converted so peak memory stays near one copy.
+    """
     session = get_session()
-    return session.sql(sql).to_pandas()
+    with session.connection.cursor() as cur:
+        cur.execute(sql, params)
+        table = cur.fetch_arrow_all()
+        if table is None:  # no rows — keep the column names
+            return pd.DataFrame(columns=[col[0] for col in cur.description or []])
+    return table.to_pandas(split_blocks=True, self_destruct=True)
 
 
 # ---------------------------------------------------------------------------
 # Cortex Agent helper (container runtime auth)
 # ---------------------------------------------------------------------------
+# Chat history cap (user + assistant messages, i.e. 20 turns)
+AGENT_HISTORY_LIMIT = 40
+
+
 def call_cortex_agent_streaming(question: str, broker_context: str = ""):
     """Call the Broker Intelligence Agent via REST API with streaming.
     
@@ -286,7 +356,7 @@ def call_cortex_agent_streaming(question: str, broker_context: str = ""):
         yield ("answer", "Agent unavailable — SNOWFLAKE_HOST not set.")
         return
     try:
-        token = open("/snowflake/session/token", "r").read()
+        token = read_session_token()
     except FileNotFoundError:
         yield ("answer", "Agent unavailable — session token not found.")
         return
@@ -312,7 +382,7 @@ def call_cortex_agent_streaming(question: str, broker_context: str = ""):
         }],
     }
     try:
-        resp = requests.post(url, headers=headers, json=payload, timeout=120, stream=True)
+        resp = get_http_session().post(url, headers=headers, data=orjson.dumps(payload), timeout=120, stream=True)
         if resp.status_code != 200:
             yield ("answer", f"Agent returned HTTP {resp.status_code}")
             return
@@ -329,7 +399,7 @@ def call_cortex_agent_streaming(question: str, broker_context: str = ""):
                 if not event.data or event.data.strip() == "" or event.data == "[DONE]":
                     continue
                 
-                parsed = json.loads(event.data)
+                parsed = orjson.loads(event.data)
                 event_type = event.event or ""
                 
                 # Helper: check if text looks like actual SQL
@@ -525,7 +595,7 @@ def call_cortex_agent_streaming(question: str, broker_context: str = ""):
                     if sql:
                         yield ("sql", sql)
                 
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 continue
             except Exception:
                 continue
@@ -613,47 +683,54 @@ def _highlight_sql(sql_text: str) -> str:
     return escaped
 
 
-def render_thinking_html(steps: list) -> str:
-    """Render thinking steps as a bare HTML fragment with inline styles for ``st.html()``."""
+@functools.lru_cache(maxsize=256)
+def _render_step_html(category: str, text: str, step_reasoning: str) -> str:
+    """Render a single thinking step; memoized so finished steps aren't re-rendered per token."""
     import html as html_mod
 
-    parts = []
-    for step in steps:
-        category = step.get("category", "planning")
-        text = step.get("text", "")
-        step_reasoning = step.get("reasoning", "")
-
-        reasoning_block = ""
-        if step_reasoning:
-            display = step_reasoning
-            if len(display) > 1500:
-                display = display[:1500] + "\u2026"
-            reasoning_block = (
-                '<div style="font-size:0.75rem;color:#9fabc1;line-height:1.4;white-space:pre-wrap;'
-                'margin:4px 0 0 24px;padding:6px 10px;background:rgba(30,37,47,0.6);'
-                'border-radius:4px;border-left:2px solid #1db588;max-height:200px;overflow-y:auto">'
-                f'{html_mod.escape(display)}</div>'
-            )
+    reasoning_block = ""
+    if step_reasoning:
+        display = step_reasoning
+        if len(display) > 1500:
+            display = display[:1500] + "\u2026"
+        reasoning_block = (
+            '<div style="font-size:0.75rem;color:#9fabc1;line-height:1.4;white-space:pre-wrap;'
+            'margin:4px 0 0 24px;padding:6px 10px;background:rgba(30,37,47,0.6);'
+            'border-radius:4px;border-left:2px solid #1db588;max-height:200px;overflow-y:auto">'
+            f'{html_mod.escape(display)}</div>'
+        )
 
-        if category == "sql":
-            highlighted = _highlight_sql(text)
-            parts.append(
-                '<details open class="sql-details">'
-                '<summary>\U0001f4ca SQL Query'
-                '<span style="margin-left:auto;font-size:0.6rem;background:#9c5bea22;'
-                'color:#9c5bea;padding:1px 6px;border-radius:3px;font-weight:400">SQL</span>'
-                '</summary>'
-                f'<pre><code>{highlighted}</code></pre></details>'
-            )
-        else:
-            icon = "\u2713" if category == "planning" else "\u26a1"
-            color = "#1a6ce7" if category == "planning" else "#e8a317"
-            parts.append(
-                f'<div style="font-size:0.85rem;color:#bdc4d5;border-left:3px solid {color};'
-                f'padding-left:12px;margin-bottom:8px">'
-                f'<span style="margin-right:6px">{icon}</span> {html_mod.escape(text)}'
-                f'{reasoning_block}</div>'
-            )
+    if category == "sql":
+        highlighted = _highlight_sql(text)
+        return (
+            '<details open class="sql-details">'
+            '<summary>\U0001f4ca SQL Query'
+            '<span style="margin-left:auto;font-size:0.6rem;background:#9c5bea22;'
+            'color:#9c5bea;padding:1px 6px;border-radius:3px;font-weight:400">SQL</span>'
+            '</summary>'
+            f'<pre><code>{highlighted}</code></pre></details>'
+        )
+
+    icon = "\u2713" if category == "planning" else "\u26a1"
+    color = "#1a6ce7" if category == "planning" else "#e8a317"
+    return (
+        f'<div style="font-size:0.85rem;color:#bdc4d5;border-left:3px solid {color};'
+        f'padding-left:12px;margin-bottom:8px">'
+        f'<span style="margin-right:6px">{icon}</span> {html_mod.escape(text)}'
+        f'{reasoning_block}</div>'
+    )
+
+
+def render_thinking_html(steps: list) -> str:
+    """Render thinking steps as a bare HTML fragment with inline styles for ``st.html()``."""
+    parts = [
+        _render_step_html(
+            step.get("category", "planning"),
+            step.get("text", ""),
+            step.get("reasoning", ""),
+        )
+        for step in steps
+    ]
 
     if not parts:
         body = '<div style="padding:12px 0"><em style="color:#bdc4d5">\u23f3 Processing...</em></div>'
@@ -666,107 +743,136 @@ def render_thinking_html(steps: list) -> str:
     )
 
 
-def call_cortex_agent(question: str, broker_context: str = "") -> str:
-    """Call the Broker Intelligence Agent via REST API (non-streaming fallback)."""
-    host = os.getenv("SNOWFLAKE_HOST")
-    if not host:
-        return "Agent unavailable — SNOWFLAKE_HOST not set."
-    try:
-        token = open("/snowflake/session/token", "r").read()
-    except FileNotFoundError:
-        return "Agent unavailable — session token not found."
+def call_cortex_agent(question: str, broker_context: str = ""):
+    """Call the Broker Intelligence Agent and yield only answer text deltas.
 
-    full_question = f"Regarding broker '{broker_context}': {question}" if broker_context else question
-
-    url = (
-        f"https://{host}/api/v2/databases/APEX_CAPITAL_DEMO"
-        f"/schemas/ANALYTICS/agents/APEX_BROKER_AGENT:run"
-    )
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {token}",
-        "X-Snowflake-Authorization-Token-Type": "OAUTH",
-        "Accept": "application/json",
-    }
-    payload = {
-        "stream": False,
-        "messages": [{
-            "role": "user",
-            "content": [{"type": "text", "text": full_question}]
-        }],
-    }
-    try:
-        resp = requests.post(url, headers=headers, json=payload, timeout=90)
-        if resp.status_code != 200:
-            return f"Agent returned HTTP {resp.status_code}"
-        data = resp.json()
-        
-        # Extract text from the response - handle multiple formats
-        text_parts = []
-        
-        # Check for 'message' (singular) or 'messages' (plural)
-        messages = data.get("messages", [])
-        if not messages and "message" in data:
-            messages = [data["message"]]
-        
-        for msg in messages:
-            if msg.get("role") != "assistant":
-                continue
-            content = msg.get("content", [])
-            if isinstance(content, str):
-                text_parts.append(content)
-            elif isinstance(content, list):
-                for item in content:
-                    if isinstance(item, dict) and item.get("type") == "text":
-                        text_parts.append(item.get("text", ""))
-        
-        if text_parts:
-            return "\n".join(filter(None, text_parts))
-        
-        # Fallback: try to find any text in the response
-        if "text" in data:
-            return data["text"]
-        
-        return "No response from agent."
-    except requests.exceptions.Timeout:
-        return "Agent request timed out. Please try again."
-    except Exception as e:
-        return f"Agent error: {str(e)}"
+    Shares the SSE request/parsing of ``call_cortex_agent_streaming`` so callers
+    can render tokens as they arrive, e.g. ``st.write_stream(call_cortex_agent(q))``.
+    """
+    previous = ""
+    for mode, text in call_cortex_agent_streaming(question, broker_context=broker_context):
+        if mode != "answer":
+            continue
+        # Answer events carry the cumulative text; emit just the new suffix
+        yield text[len(previous):] if text.startswith(previous) else text
+        previous = text
 
 
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
+_RISK_BADGE_CLASS = {
+    "LOW": "risk-low",
+    "MEDIUM": "risk-medium",
+    "HIGH": "risk-high",
+    "CRITICAL": "risk-critical",
+    "N/A": "risk-na",
+    "NONE": "risk-na",
+}
+
+
+_RISK_BADGE_TMPL = '<span class="risk-badge {css_class}">{level}</span>'
+# Canonical levels are rendered once; anything else goes through the template
+_RISK_BADGES = {
+    lvl: _RISK_BADGE_TMPL.format(css_class=css_class, level=lvl)
+    for lvl, css_class in _RISK_BADGE_CLASS.items()
+}
+
+
 def risk_badge(level: str) -> str:
+    badge = _RISK_BADGES.get(level)
+    if badge is not None:
+        return badge
     level_str = str(level).upper() if level else "N/A"
-    css_class = {
-        "LOW": "risk-low",
-        "MEDIUM": "risk-medium",
-        "HIGH": "risk-high",
-        "CRITICAL": "risk-critical",
-        "N/A": "risk-na",
-        "NONE": "risk-na",
-    }.get(level_str, "risk-na")
-    return f'<span class="risk-badge {css_class}">{level}</span>'
+    return _RISK_BADGE_TMPL.format(css_class=_RISK_BADGE_CLASS.get(level_str, "risk-na"), level=level)
+
+
+_STAT_CARD_TMPL = (
+    '<div class="stat-card">'
+    '<div class="stat-label">{label}</div>'
+    '<div class="stat-value" style="color:{color}">{value}</div>'
+    "</div>"
+)
 
 
 def stat_card(label: str, value: str, color: str = "var(--text-header)") -> str:
-    return f"""
-    <div class="stat-card">
-        <div class="stat-label">{label}</div>
-        <div class="stat-value" style="color:{color}">{value}</div>
-    </div>
-    """
+    return _STAT_CARD_TMPL.format(label=label, value=value, color=color)
+
+
+def stat_row(cards) -> str:
+    """A row of stat cards as one flex container (one st.html delta)."""
+    return '<div class="stat-row">' + "".join(stat_card(*card) for card in cards) + "</div>"
+
+
+# Score bands: < 0.4 red, < 0.6 amber, < 0.8 blue, else green
+_MATCH_THRESHOLDS = (0.4, 0.6, 0.8)
+_MATCH_COLORS = ("#ef405e", "#e8a317", "#5999f8", "#1db588")
+_MATCH_COLORS_NP = np.array(_MATCH_COLORS)
 
 
 def match_color(score: float) -> str:
-    if score >= 0.8:
-        return "#1db588"
-    if score >= 0.6:
-        return "#5999f8"
-    if score >= 0.4:
-        return "#e8a317"
-    return "#ef405e"
+    # A NULL score arrives as NaN, which bisects past every threshold
+    if not score >= _MATCH_THRESHOLDS[0]:
+        return _MATCH_COLORS[0]
+    return _MATCH_COLORS[bisect.bisect_right(_MATCH_THRESHOLDS, score)]
+
+
+def match_colors(scores) -> np.ndarray:
+    """Vectorized ``match_color`` for an array of scores (NaN is red)."""
+    scores = np.asarray(scores, dtype=float)
+    idx = np.searchsorted(_MATCH_THRESHOLDS, scores, side="right")
+    return _MATCH_COLORS_NP[np.where(np.isnan(scores), 0, idx)]
+
+
+def _gauge_point(val: float, cx: float = 100, cy: float = 110, r: float = 80) -> tuple[float, float]:
+    """Point on the gauge arc for a 0–100 value (0 = left, 100 = right)."""
+    angle = math.pi * (1 - max(0.0, min(100.0, val)) / 100)
+    return cx + r * math.cos(angle), cy - r * math.sin(angle)
+
+
+def _gauge_arc(start: float, end: float, color: str, width: int = 18) -> str:
+    x0, y0 = _gauge_point(start)
+    x1, y1 = _gauge_point(end)
+    return (
+        f'<path d="M {x0:.2f} {y0:.2f} A 80 80 0 0 1 {x1:.2f} {y1:.2f}" '
+        f'fill="none" stroke="{color}" stroke-width="{width}"/>'
+    )
+
+
+# Track, risk bands and axis labels never change; only the value bar and
+# number are filled in per broker.
+_GAUGE_BANDS = "".join(
+    _gauge_arc(lo, hi, band_color, width=26)
+    for lo, hi, band_color in (
+        (0, 30, "rgba(29,181,136,0.1)"),
+        (30, 60, "rgba(232,163,23,0.1)"),
+        (60, 100, "rgba(211,19,47,0.1)"),
+    )
+)
+_GAUGE_TMPL = (
+    '<div style="background:#191e24;text-align:center;font-family:Inter,sans-serif">'
+    '<div style="font-size:13px;color:#9fabc1;padding-top:8px">Composite risk</div>'
+    '<svg viewBox="0 0 200 130" width="100%" height="160" role="img" aria-label="Composite risk gauge">'
+    + _gauge_arc(0, 100, "#293246", width=26)
+    + _GAUGE_BANDS
+    + "{bar}"
+    '<text x="20" y="128" font-size="10" fill="#70819a" text-anchor="middle">0</text>'
+    '<text x="180" y="128" font-size="10" fill="#70819a" text-anchor="middle">100</text>'
+    '<text x="100" y="108" font-size="36" font-weight="600" fill="{color}" text-anchor="middle">{val}</text>'
+    "</svg></div>"
+)
+
+
+@functools.lru_cache(maxsize=128)
+def _svg_gauge(val: int | None, color: str) -> str:
+    """Composite-risk gauge as inline SVG (replaces the Plotly indicator).
+
+    ``None`` (a NULL score) draws the empty track labelled "N/A".
+    """
+    if val is None:
+        return _GAUGE_TMPL.format(bar="", color=color, val="N/A")
+    bar = _gauge_arc(0, val, color) if val > 0 else ""
+    return _GAUGE_TMPL.format(bar=bar, color=color, val=val)
 
 
 # ---------------------------------------------------------------------------
@@ -790,8 +896,12 @@ tab_map, tab_match, tab_broker = st.tabs(
     ]
 )
 
+# Each tab body is a fragment: widget interactions rerun only that tab, so
+# e.g. chatting on Broker 360 never re-enters the map loaders.
+
 # ===== TAB 1: Command Map ===================================================
-with tab_map:
+@st.fragment
+def render_command_map():
 
     @st.cache_data(ttl=300)
     def load_map_data():
@@ -821,6 +931,10 @@ with tab_map:
             FROM APEX_CAPITAL_DEMO.RAW.TEXAS_WEATHER
             GROUP BY CITY_NAME, WEATHER_RISK_LEVEL
         """)
+        # Low-cardinality filter columns as categoricals: isin/== compare int codes
+        for col in ("EQUIPMENT_REQUIRED", "RISK_LEVEL", "FRAUD_RISK_LEVEL"):
+            recs[col] = recs[col].astype("category")
+        weather["WEATHER_RISK_LEVEL"] = weather["WEATHER_RISK_LEVEL"].astype("category")
         return recs, weather
 
     @st.cache_data(ttl=300)
@@ -857,6 +971,11 @@ with tab_map:
         except (KeyError, IndexError):
             return None
 
+    @st.cache_data(ttl=300)
+    def deck_to_html(_deck: pdk.Deck, filter_key: tuple) -> str:
+        """Standalone deck.gl page, memoized per filter combination (the deck itself is not hashed)."""
+        return _deck.to_html(as_string=True, notebook_display=False)
+
     recs_map_df, weather_df = load_map_data()
     route_polylines_df = load_route_polylines()
 
@@ -886,8 +1005,8 @@ with tab_map:
             .drop_duplicates()
             .sort_values("DRIVER_ID")
         )
-        driver_labels = driver_opts.apply(
-            lambda r: f"Driver {r['DRIVER_ID']} — {r['CARRIER_NAME']}", axis=1
+        driver_labels = (
+            "Driver " + driver_opts["DRIVER_ID"].astype(str) + " — " + driver_opts["CARRIER_NAME"].astype(str)
         ).tolist()
         sel_driver_label = st.selectbox("Driver", driver_labels, label_visibility="collapsed")
         sel_driver_id = int(sel_driver_label.split(" — ")[0].replace("Driver ", ""))
@@ -938,19 +1057,19 @@ with tab_map:
         & (recs_map_df["TOTAL_RATE"] >= min_rate)
     ].copy()
 
-    # --- KPI row (dynamic, filtered) ---
-    kpi_cols = st.columns(4)
-    with kpi_cols[0]:
-        st.html(stat_card("Matched loads", str(len(filtered_df))))
-    with kpi_cols[1]:
-        avg_rate = f"${filtered_df['TOTAL_RATE'].mean():,.0f}" if len(filtered_df) else "$0"
-        st.html(stat_card("Avg rate", avg_rate, "var(--success)"))
-    with kpi_cols[2]:
-        strong_ct = len(filtered_df[filtered_df["RISK_LEVEL"] == "STRONG_MATCH"])
-        st.html(stat_card("Strong matches", str(strong_ct), "var(--success)"))
-    with kpi_cols[3]:
-        low_fraud = len(filtered_df[filtered_df["FRAUD_RISK_LEVEL"] == "LOW"])
-        st.html(stat_card("Low fraud risk", str(low_fraud)))
+    # --- KPI row (dynamic, filtered; counted from masks, no sub-frame copies) ---
+    avg_rate = f"${filtered_df['TOTAL_RATE'].mean():,.0f}" if len(filtered_df) else "$0"
+    strong_ct = int((filtered_df["RISK_LEVEL"] == "STRONG_MATCH").sum())
+    low_fraud = int((filtered_df["FRAUD_RISK_LEVEL"] == "LOW").sum())
+    st.html(stat_row([
+        ("Matched loads", str(len(filtered_df))),
+        ("Avg rate", avg_rate, "var(--success)"),
+        ("Strong matches", str(strong_ct), "var(--success)"),
+        ("Low fraud risk", str(low_fraud)),
+    ]))
+
+    # Per-load markers beyond this count are hex-binned client-side
+    MAP_POINT_LIMIT = 2000
 
     # --- Pydeck color helpers ---
     _RISK_RGBA = {
@@ -959,6 +1078,12 @@ with tab_map:
         "MEDIUM_MATCH": [232, 163, 23, 200],     # orange
         "NO_MATCH": [224, 82, 82, 200],          # red
     }
+    # Markers ship a single uint8 RISK_ID per row and deck.gl looks the color
+    # up in this palette client-side; the trailing entry is the fallback for
+    # unknown levels (indexer -1 wraps to it)
+    _RISK_INDEX = pd.Index(list(_RISK_RGBA))
+    _RISK_PALETTE = list(_RISK_RGBA.values()) + [[128, 128, 128, 180]]
+    _RISK_FILL_EXPR = f"{_RISK_PALETTE}[RISK_ID]"
 
     # --- Build pydeck map ---
     event = None
@@ -972,12 +1097,10 @@ with tab_map:
 
             # Prepare origin markers dataframe
             markers_df = filtered_df.copy()
-            markers_df["color"] = markers_df["RISK_LEVEL"].map(
-                lambda x: _RISK_RGBA.get(x, [128, 128, 128, 180])
-            )
-            markers_df["risk_label"] = markers_df["RISK_LEVEL"].map(
-                lambda x: _RISK_LABELS.get(x, x)
-            )
+            risk_codes = _RISK_INDEX.get_indexer(markers_df["RISK_LEVEL"])
+            markers_df["RISK_ID"] = (risk_codes % len(_RISK_PALETTE)).astype(np.uint8)
+            risk_levels = markers_df["RISK_LEVEL"].astype(object)
+            markers_df["risk_label"] = risk_levels.map(_RISK_LABELS).fillna(risk_levels)
             markers_df["score_pct"] = (markers_df["RECOMMENDATION_SCORE"] * 100).round(0).astype(int).astype(str) + "%"
             markers_df["rate_fmt"] = markers_df["TOTAL_RATE"].apply(lambda x: f"${x:,.0f}")
 
@@ -1086,22 +1209,38 @@ with tab_map:
                         )
                     )
 
-            # Origin load markers
-            layers.append(
-                pdk.Layer(
-                    "ScatterplotLayer",
-                    data=markers_df,
-                    id="load-origins",
-                    get_position=["ORIGIN_LONGITUDE", "ORIGIN_LATITUDE"],
-                    get_fill_color="color",
-                    get_radius=18000,
-                    radius_min_pixels=5,
-                    radius_max_pixels=14,
-                    pickable=True,
-                    auto_highlight=True,
-                    highlight_color=[255, 255, 255, 80],
+            # Origin load markers — above MAP_POINT_LIMIT, ship positions only and
+            # let deck.gl bin them on the GPU instead of one tooltip row per load
+            if len(markers_df) > MAP_POINT_LIMIT:
+                layers.append(
+                    pdk.Layer(
+                        "HexagonLayer",
+                        data=markers_df[["ORIGIN_LONGITUDE", "ORIGIN_LATITUDE"]],
+                        id="load-origins-hex",
+                        get_position=["ORIGIN_LONGITUDE", "ORIGIN_LATITUDE"],
+                        radius=20000,
+                        elevation_scale=50,
+                        extruded=True,
+                        coverage=0.9,
+                        pickable=False,
+                    )
+                )
+            else:
+                layers.append(
+                    pdk.Layer(
+                        "ScatterplotLayer",
+                        data=markers_df,
+                        id="load-origins",
+                        get_position=["ORIGIN_LONGITUDE", "ORIGIN_LATITUDE"],
+                        get_fill_color=_RISK_FILL_EXPR,
+                        get_radius=18000,
+                        radius_min_pixels=5,
+                        radius_max_pixels=14,
+                        pickable=True,
+                        auto_highlight=True,
+                        highlight_color=[255, 255, 255, 80],
+                    )
                 )
-            )
 
             # Driver home icon (larger, purple)
             layers.append(
@@ -1148,21 +1287,31 @@ with tab_map:
                 },
             }
 
+            # Render as embedded deck.gl HTML, bypassing the pydeck_chart bridge.
+            # components.html is one-way, so the embedded map has hover tooltips
+            # but no click-to-select; LOADSTAR_DECK_NATIVE restores st.pydeck_chart
+            # and with it the load detail card below (on_select needs Streamlit >=1.52).
+            deck_native = bool(os.getenv("LOADSTAR_DECK_NATIVE"))
             deck = pdk.Deck(
                 layers=layers,
                 initial_view_state=view,
                 tooltip=tooltip,
-                map_style=None,  # Auto dark/light based on Streamlit theme
+                # pydeck_chart picks dark/light from the Streamlit theme; the
+                # standalone HTML has no theme, so it gets the dark basemap
+                map_style=None if deck_native else pdk.map_styles.CARTO_DARK,
             )
 
-            # Render — use on_select for click-to-select (Streamlit >=1.52)
-            event = st.pydeck_chart(
-                deck,
-                use_container_width=True,
-                height=520,
-                on_select="rerun",
-                selection_mode="single-object",
-            )
+            if deck_native:
+                event = st.pydeck_chart(
+                    deck,
+                    use_container_width=True,
+                    height=520,
+                    on_select="rerun",
+                    selection_mode="single-object",
+                )
+            else:
+                deck_key = (sel_driver_id, tuple(sel_equip), tuple(sel_risks), min_rate, show_ors_demo)
+                components.html(deck_to_html(deck, deck_key), height=520, scrolling=False)
 
             # Inline legend below map
             legend_items = "".join(
@@ -1182,7 +1331,7 @@ with tab_map:
                 f'</div>'
             )
 
-        # --- Click-to-select detail card ---
+        # --- Click-to-select detail card (native pydeck_chart only) ---
         if not filtered_df.empty and event and event.selection:
             sel_objects = event.selection.get("objects", {})
             # Look in the load-origins layer first, then try any layer
@@ -1249,7 +1398,8 @@ with tab_map:
 
 
 # ===== TAB 2: Match Engine ===================================================
-with tab_match:
+@st.fragment
+def render_match_engine():
 
     @st.cache_data(ttl=300)
     def load_recommendations():
@@ -1271,53 +1421,56 @@ with tab_match:
     # Header controls
     ctrl_cols = st.columns([1, 1, 2])
     with ctrl_cols[0]:
-        driver_ids = sorted(recs_df["DRIVER_ID"].unique())
+        driver_ids = np.sort(recs_df["DRIVER_ID"].unique())
         sel_driver = st.selectbox("Select driver", driver_ids)
     with ctrl_cols[1]:
         min_score = st.slider("Min match score", 0.0, 1.0, 0.5, 0.05)
 
-    # Filter recommendations
-    driver_recs = (
-        recs_df[(recs_df["DRIVER_ID"] == sel_driver) & (recs_df["RECOMMENDATION_SCORE"] >= min_score)]
-        .sort_values("RECOMMENDATION_SCORE", ascending=False)
-    )
+    # Filter recommendations — only the top 8 are shown, so select them with
+    # nlargest (partial selection) instead of sorting every match
+    driver_mask = (recs_df["DRIVER_ID"] == sel_driver) & (recs_df["RECOMMENDATION_SCORE"] >= min_score)
+    match_count = int(driver_mask.sum())
 
-    if driver_recs.empty:
+    if match_count == 0:
         st.warning(f"No recommendations above {min_score:.0%} for driver {sel_driver}. Try lowering the threshold.")
     else:
         # Two-column layout: cards on left, detail panel on right
         cards_col, detail_col = st.columns([2, 1])
         
         with cards_col:
-            st.html(f'<div class="section-header">{len(driver_recs)} matching loads</div>')
+            st.html(f'<div class="section-header">{match_count} matching loads</div>')
             
-            # Create clickable cards using buttons
-            for idx, (_, rec) in enumerate(driver_recs.head(8).iterrows()):
-                score = rec["RECOMMENDATION_SCORE"]
-                sc = match_color(score)
-                fraud = rec.get("FRAUD_RISK_LEVEL", "LOW")
+            # Create clickable cards: one HTML block per card plus its Select button
+            fraud_colors = {"LOW": "🟢", "MEDIUM": "🟡", "HIGH": "🔴"}
+            top_recs = recs_df.loc[driver_mask].nlargest(8, "RECOMMENDATION_SCORE")
+            card_colors = match_colors(top_recs["RECOMMENDATION_SCORE"].to_numpy())
+            for rec, sc in zip(top_recs.itertuples(index=False), card_colors, strict=True):
+                score = rec.RECOMMENDATION_SCORE
                 
-                col1, col2, col3, col4, col5 = st.columns([1, 2, 2, 1, 1])
+                card_col, btn_col = st.columns([6, 1])
                 
-                with col1:
+                with card_col:
                     st.html(f"""
-                    <div class="match-gauge" style="border:3px solid {sc};color:{sc};margin:4px 0;">
-                        {score*100:.0f}%
+                    <div class="rec-row">
+                        <div class="match-gauge" style="border:3px solid {sc};color:{sc};margin:4px 0;">
+                            {score*100:.0f}%
+                        </div>
+                        <div>
+                            <div class="rec-title">{rec.LOAD_ID}</div>
+                            <div class="rec-sub">{rec.ORIGIN_CITY} → {rec.DESTINATION_CITY}</div>
+                        </div>
+                        <div>
+                            <div class="rec-title">${rec.TOTAL_RATE:,.0f}</div>
+                            <div class="rec-sub">{rec.MILES} miles</div>
+                        </div>
+                        <div class="rec-sub">
+                            {rec.BROKER_NAME[:15]}<br/>{fraud_colors.get(rec.FRAUD_RISK_LEVEL, "⚪")}
+                        </div>
                     </div>
                     """)
-                with col2:
-                    st.markdown(f"**{rec['LOAD_ID']}**")
-                    st.caption(f"{rec['ORIGIN_CITY']} → {rec['DESTINATION_CITY']}")
-                with col3:
-                    st.markdown(f"**${rec['TOTAL_RATE']:,.0f}**")
-                    st.caption(f"{rec.get('MILES', 'N/A')} miles")
-                with col4:
-                    st.caption(rec['BROKER_NAME'][:15])
-                    fraud_colors = {"LOW": "🟢", "MEDIUM": "🟡", "HIGH": "🔴"}
-                    st.caption(fraud_colors.get(fraud, "⚪"))
-                with col5:
-                    if st.button("Select", key=f"sel_{rec['LOAD_ID']}"):
-                        st.session_state.selected_load = rec.to_dict()
+                with btn_col:
+                    if st.button("Select", key=f"sel_{rec.LOAD_ID}"):
+                        st.session_state.selected_load = rec._asdict()
                         st.rerun()
                 
                 st.divider()
@@ -1426,70 +1579,65 @@ with tab_match:
 
 
 # ===== TAB 3: Broker 360 Inspector ==========================================
-with tab_broker:
+@st.fragment
+def render_broker_360():
 
     @st.cache_data(ttl=300)
-    def load_brokers():
+    def load_broker_names():
         return run_query("""
+            SELECT BROKER_NAME
+            FROM APEX_CAPITAL_DEMO.ANALYTICS.BROKER_360
+            ORDER BY BROKER_NAME
+        """)["BROKER_NAME"]
+
+    # One cached row per viewed broker instead of the whole table
+    @st.cache_data(ttl=300)
+    def load_broker(name: str):
+        df = run_query("""
             SELECT BROKER_ID, BROKER_NAME, MC_NUMBER, HQ_STATE,
                    CREDIT_SCORE, FACTORING_TYPE, TOTAL_INVOICES,
-                   TOTAL_FACTORED_AMOUNT, AVG_DAYS_TO_PAY,
+                   AVG_DAYS_TO_PAY,
                    DISPUTED_INVOICES, FRAUD_RISK_LEVEL,
                    COMPOSITE_RISK_SCORE, DOUBLE_BROKER_FLAG,
                    CURRENT_WEATHER_RISK, UNIQUE_LANES,
                    PRIMARY_ORIGIN, PRIMARY_DESTINATION,
-                   LANE_DENSITY, LAST_REFRESHED
+                   LANE_DENSITY,
+                   -- Display strings are formatted by the warehouse; the mask is
+                   -- fixed-width (overflow renders as #), so it covers 18 digits
+                   COALESCE(TRIM(TO_VARCHAR(TOTAL_FACTORED_AMOUNT, '$999,999,999,999,999,990')), 'N/A') AS TOTAL_FACTORED_STR,
+                   COALESCE(TO_VARCHAR(LAST_REFRESHED, 'YYYY-MM-DD HH24:MI:SS'), 'N/A') AS LAST_REFRESHED_STR
             FROM APEX_CAPITAL_DEMO.ANALYTICS.BROKER_360
-            ORDER BY BROKER_NAME
-        """)
+            WHERE BROKER_NAME = %s
+            LIMIT 1
+        """, (name,))
+        return None if df.empty else df.iloc[0]
 
-    brokers_df = load_brokers()
+    broker_names = load_broker_names()
 
     # Broker selector
     col_sel, col_spacer = st.columns([2, 3])
     with col_sel:
         st.html('<div class="section-header">Broker lookup</div>')
-        broker_names = brokers_df["BROKER_NAME"].tolist()
         sel_broker = st.selectbox("Search broker", broker_names, label_visibility="collapsed")
 
-    broker = brokers_df[brokers_df["BROKER_NAME"] == sel_broker].iloc[0]
+    broker = load_broker(sel_broker) if sel_broker is not None else None
+    if broker is None:
+        st.info("Broker not found. It may have been removed since the list was loaded; pick another broker.")
+        return
 
     # Header row — risk gauge + identity
     h_left, h_right = st.columns([1, 3])
     with h_left:
         risk_val = broker["COMPOSITE_RISK_SCORE"]
-        risk_color = (
-            "#1db588" if risk_val < 30
-            else "#e8a317" if risk_val < 60
-            else "#ef405e"
-        )
-        gauge = go.Figure(
-            go.Indicator(
-                mode="gauge+number",
-                value=float(risk_val),
-                gauge=dict(
-                    axis=dict(range=[0, 100], tickcolor="#70819a"),
-                    bar=dict(color=risk_color),
-                    bgcolor="#293246",
-                    borderwidth=0,
-                    steps=[
-                        dict(range=[0, 30], color="rgba(29,181,136,0.1)"),
-                        dict(range=[30, 60], color="rgba(232,163,23,0.1)"),
-                        dict(range=[60, 100], color="rgba(211,19,47,0.1)"),
-                    ],
-                ),
-                title=dict(text="Composite risk", font=dict(size=13, color="#9fabc1")),
-                number=dict(font=dict(size=36, color=risk_color)),
+        if pd.isna(risk_val):
+            st.html(_svg_gauge(None, "#70819a"))
+        else:
+            risk_color = (
+                "#1db588" if risk_val < 30
+                else "#e8a317" if risk_val < 60
+                else "#ef405e"
             )
-        )
-        gauge.update_layout(
-            paper_bgcolor="#191e24",
-            plot_bgcolor="#1e252f",
-            height=200,
-            margin=dict(l=20, r=20, t=40, b=10),
-            font=dict(family="Inter"),
-        )
-        st.plotly_chart(gauge, use_container_width=True)
+            st.html(_svg_gauge(round(float(risk_val)), risk_color))
 
     with h_right:
         fraud_badge = risk_badge(broker["FRAUD_RISK_LEVEL"])
@@ -1512,24 +1660,21 @@ with tab_broker:
             <div style="margin-top:12px;font-size:0.8rem;color:var(--text-secondary);">
                 Primary lane: {broker.get('PRIMARY_ORIGIN', 'N/A')} &rarr; {broker.get('PRIMARY_DESTINATION', 'N/A')}
                 &middot; {broker.get('UNIQUE_LANES', 0)} unique lanes
-                &middot; Last refreshed: {str(broker.get('LAST_REFRESHED', 'N/A'))[:19]}
+                &middot; Last refreshed: {broker['LAST_REFRESHED_STR']}
             </div>
         </div>
         """
         st.html(header_html)
 
     # Stat cards
-    stat_cols = st.columns(5)
     stats = [
         ("Credit score", f"{broker['CREDIT_SCORE']:.0f}", "#5999f8"),
         ("Avg days to pay", f"{broker['AVG_DAYS_TO_PAY']:.1f}", "var(--text-header)"),
         ("Total invoices", f"{broker['TOTAL_INVOICES']:,}", "var(--text-header)"),
         ("Disputed", f"{broker['DISPUTED_INVOICES']}", "var(--danger-light)" if broker["DISPUTED_INVOICES"] > 5 else "var(--text-header)"),
-        ("Total factored", f"${broker['TOTAL_FACTORED_AMOUNT']:,.0f}", "var(--success)"),
+        ("Total factored", broker["TOTAL_FACTORED_STR"], "var(--success)"),
     ]
-    for i, (label, val, color) in enumerate(stats):
-        with stat_cols[i]:
-            st.html(stat_card(label, val, color))
+    st.html(stat_row(stats))
 
     # Weather + additional context
     wx_col, agent_col = st.columns([1, 2])
@@ -1558,10 +1703,13 @@ with tab_broker:
         for msg in st.session_state.agent_messages:
             avatar = "👤" if msg["role"] == "user" else "🤖"
             with st.chat_message(msg["role"], avatar=avatar):
-                # Show thinking in expander for assistant messages (if available)
+                # Show thinking in expander for assistant messages (if available);
+                # only the latest turn keeps its steps, older ones are archived
                 if msg["role"] == "assistant" and msg.get("thinking_steps"):
                     with st.expander("🧠 View agent reasoning", expanded=False):
                         st.html(render_thinking_html(msg["thinking_steps"]))
+                elif msg.get("reasoning_archived"):
+                    st.caption("🧠 Reasoning (archived)")
                 st.markdown(msg["content"])
 
         if prompt := st.chat_input(
@@ -1580,6 +1728,7 @@ with tab_broker:
                 
                 # Chronological list of steps (preserves order as they happen)
                 steps = []  # List of {"category": ..., "text": ..., "reasoning": ...}
+                seen_status_texts: set[str] = set()  # Status texts already shown (retries re-emit them)
                 prev_reasoning_len = 0  # Track how much reasoning we've already assigned
                 full_response = ""
                 
@@ -1593,11 +1742,13 @@ with tab_broker:
                 
                 for mode, text in call_cortex_agent_streaming(prompt, broker_context=sel_broker):
                     if mode == "status":
+                        # Skip statuses already shown anywhere in the run — nothing to re-render
+                        if text in seen_status_texts:
+                            continue
+                        seen_status_texts.add(text)
                         # Store step with category in chronological order
                         category = categorize_status(text)
-                        # Only add if not a duplicate of the last step
-                        if not steps or steps[-1].get("text") != text:
-                            steps.append({"category": category, "text": text, "reasoning": ""})
+                        steps.append({"category": category, "text": text, "reasoning": ""})
                         # Update display
                         thinking_placeholder.html(render_thinking_html(steps))
                     elif mode == "sql":
@@ -1636,6 +1787,22 @@ with tab_broker:
                 thinking_placeholder.html(render_thinking_html(steps))
                 response_placeholder.markdown(full_response)
 
+            # Keep reasoning only for the newest turn so replay stays O(last turn)
+            for old_msg in st.session_state.agent_messages:
+                if old_msg.pop("thinking_steps", None):
+                    old_msg["reasoning_archived"] = True
             st.session_state.agent_messages.append(
                 {"role": "assistant", "content": full_response, "thinking_steps": steps}
             )
+            if len(st.session_state.agent_messages) > AGENT_HISTORY_LIMIT:
+                st.session_state.agent_messages = st.session_state.agent_messages[-AGENT_HISTORY_LIMIT:]
+
+
+with tab_map:
+    render_command_map()
+
+with tab_match:
+    render_match_engine()
+
+with tab_broker:
+    render_broker_360()
@@ -1,5 +1,12 @@
 """Shared fixtures for LoadStar quality tests."""
+import ast
+import json
 import os
+import re
+import subprocess
+import sys
+from dataclasses import dataclass
+
 import pytest
 
 
@@ -27,3 +34,157 @@ def sf_session():
 def project_root():
     """Return the project root directory."""
     return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+_ROOT_BLOCK_RE = re.compile(r":root\s*\{([^}]+)\}")
+_CSS_VAR_RE = re.compile(r"--([\w-]+)\s*:\s*([^;]+);")
+_VAR_REF_RE = re.compile(r"var\(\s*(--[\w-]+)")
+_TOKEN_RE = re.compile(r"[\w-]+")
+
+
+def _module_string_constant(tree, name):
+    """Value of a top-level ``name = "..."`` assignment, or "" if absent."""
+    for node in tree.body:
+        if (
+            isinstance(node, ast.Assign)
+            and isinstance(node.value, ast.Constant)
+            and isinstance(node.value.value, str)
+            and any(isinstance(t, ast.Name) and t.id == name for t in node.targets)
+        ):
+            return node.value.value
+    return ""
+
+
+@dataclass(frozen=True)
+class AppSource:
+    """streamlit_app.py source plus the pieces the static tests inspect."""
+
+    path: str
+    text: str
+    lines: list
+    neumorph_css: str
+    root_vars: dict
+    # var(--x) references anywhere in the source, CSS included
+    referenced_vars: frozenset
+    # Identifier-like tokens in the source outside NEUMORPH_CSS
+    code_tokens: frozenset
+
+
+@pytest.fixture(scope="session")
+def app_source(project_root):
+    """Read and pre-parse the Streamlit app source once per session."""
+    app_path = os.path.join(project_root, "streamlit", "streamlit_app.py")
+    if not os.path.isfile(app_path):
+        pytest.skip("App file not found")
+    with open(app_path) as f:
+        text = f.read()
+
+    css = _module_string_constant(ast.parse(text), "NEUMORPH_CSS")
+    # --var: value pairs from the :root block
+    root_match = _ROOT_BLOCK_RE.search(css)
+    pairs = _CSS_VAR_RE.findall(root_match.group(1)) if root_match else []
+
+    return AppSource(
+        path=app_path,
+        text=text,
+        lines=text.splitlines(keepends=True),
+        neumorph_css=css,
+        root_vars={f"--{name}": val.strip() for name, val in pairs},
+        referenced_vars=frozenset(_VAR_REF_RE.findall(text)),
+        code_tokens=frozenset(_TOKEN_RE.findall(text.replace(css, "") if css else text)),
+    )
+
+
+@pytest.fixture(scope="session")
+def ruff_report(project_root):
+    """Ruff E/F/S findings for all Python sources, keyed by absolute file path.
+
+    One ruff process per session; tests filter by file and rule prefix.
+    """
+    try:
+        # Exec the native binary directly rather than through `python -m ruff`
+        from ruff.__main__ import find_ruff_bin
+
+        ruff_cmd = [find_ruff_bin()]
+    except (ImportError, FileNotFoundError):
+        ruff_cmd = [sys.executable, "-m", "ruff"]
+    try:
+        result = subprocess.run(
+            ruff_cmd + ["check", "streamlit", "tests",
+                        "--select", "E,F,S", "--output-format", "json"],
+            capture_output=True, text=True, cwd=project_root, timeout=60
+        )
+    except subprocess.TimeoutExpired:
+        pytest.skip("ruff did not finish within 60s")
+    if "No module named ruff" in result.stderr:
+        pytest.skip("ruff is not installed")
+    report = {}
+    for item in json.loads(result.stdout or "[]"):
+        report.setdefault(os.path.abspath(item["filename"]), []).append(item)
+    return report
+
+
+# Objects visible through INFORMATION_SCHEMA, fetched in one UNION ALL query
+_INFORMATION_SCHEMA_OBJECTS_SQL = """
+    SELECT TABLE_SCHEMA AS SCHEMA_NAME, 'TABLE' AS KIND, TABLE_NAME AS NAME
+    FROM APEX_CAPITAL_DEMO.INFORMATION_SCHEMA.TABLES
+    WHERE TABLE_TYPE = 'BASE TABLE'
+    UNION ALL
+    SELECT FUNCTION_SCHEMA, 'FUNCTION', FUNCTION_NAME
+    FROM APEX_CAPITAL_DEMO.INFORMATION_SCHEMA.FUNCTIONS
+    UNION ALL
+    SELECT PROCEDURE_SCHEMA, 'PROCEDURE', PROCEDURE_NAME
+    FROM APEX_CAPITAL_DEMO.INFORMATION_SCHEMA.PROCEDURES
+    UNION ALL
+    SELECT SCHEMA_NAME, 'SCHEMA', SCHEMA_NAME
+    FROM APEX_CAPITAL_DEMO.INFORMATION_SCHEMA.SCHEMATA
+"""
+
+# Object kinds INFORMATION_SCHEMA does not expose, one database-wide SHOW each
+_SHOW_OBJECTS_SQL = {
+    "DYNAMIC TABLE": "SHOW DYNAMIC TABLES IN DATABASE APEX_CAPITAL_DEMO",
+    "SEMANTIC VIEW": "SHOW SEMANTIC VIEWS IN DATABASE APEX_CAPITAL_DEMO",
+    "AGENT": "SHOW AGENTS IN DATABASE APEX_CAPITAL_DEMO",
+    "MODEL": "SHOW MODELS IN DATABASE APEX_CAPITAL_DEMO",
+    "STREAM": "SHOW STREAMS IN DATABASE APEX_CAPITAL_DEMO",
+    "TASK": "SHOW TASKS IN DATABASE APEX_CAPITAL_DEMO",
+    "MASKING POLICY": "SHOW MASKING POLICIES IN DATABASE APEX_CAPITAL_DEMO",
+}
+
+
+@dataclass(frozen=True)
+class DeployedObjects:
+    """Objects in APEX_CAPITAL_DEMO plus the kinds that could not be listed."""
+
+    # (schema, kind, name) tuples
+    objects: frozenset
+    # kind -> error from its SHOW statement (feature or privilege missing)
+    unavailable: dict
+
+    def __contains__(self, key):
+        return key in self.objects
+
+    def require(self, kind):
+        """Skip the calling test if objects of ``kind`` could not be listed."""
+        if kind in self.unavailable:
+            pytest.skip(f"Cannot list {kind} objects: {self.unavailable[kind]}")
+
+
+@pytest.fixture(scope="session")
+def deployed_objects(sf_session):
+    """Every object in APEX_CAPITAL_DEMO; a failing SHOW marks only its kind unavailable."""
+    from snowflake.snowpark.exceptions import SnowparkSQLException
+
+    objects = {
+        (row["SCHEMA_NAME"], row["KIND"], row["NAME"])
+        for row in sf_session.sql(_INFORMATION_SCHEMA_OBJECTS_SQL).collect()
+    }
+    unavailable = {}
+    for kind, sql in _SHOW_OBJECTS_SQL.items():
+        try:
+            rows = sf_session.sql(sql).collect()
+        except SnowparkSQLException as e:
+            unavailable[kind] = str(e)
+            continue
+        objects.update((row["schema_name"], kind, row["name"]) for row in rows)
+    return DeployedObjects(objects=frozenset(objects), unavailable=unavailable)
@@ -1,27 +1,108 @@
 """Notebook syntax and structure validation tests."""
 import ast
+import functools
+import hashlib
 import json
 import os
+import pathlib
+import re
+import sys
 import pytest
 
+try:
+    import orjson
+except ImportError:  # stdlib json is the fallback
+    orjson = None
+
+# Snowflake notebooks store SQL as code cells; match the leading keyword only
+_SQL_PREFIX_RE = re.compile(
+    r"(?:--|SELECT|INSERT|CREATE|DROP|ALTER|USE |SHOW |DESCRIBE |GRANT |CALL "
+    r"|TRUNCATE|DELETE|UPDATE|MERGE|WITH )",
+    re.IGNORECASE,
+)
+
+_CRED_RE = re.compile(r"(password|token|secret|api_key)\s*=", re.IGNORECASE)
+# Known safe patterns that contain keyword substrings but are not credentials
+_SAFE_RE = re.compile("|".join(map(re.escape, [
+    "/snowflake/session/token",  # SPCS token file read
+    "token = open(",             # SPCS token file read
+    ".connection.token",         # Snowpark session token attribute
+    "conn.token",                # Snowpark session token via alias
+    'Token=\\"',                 # Snowflake auth header pattern
+    "Token=\"",                  # Snowflake auth header pattern
+])))
+
 
 def load_notebook(path):
     """Load a notebook and return its cells."""
-    with open(path) as f:
-        nb = json.load(f)
+    with open(path, "rb") as f:
+        nb = orjson.loads(f.read()) if orjson else json.load(f)
     return nb.get("cells", [])
 
 
+def _cell_source(cell):
+    """Cell source as one string; nbformat allows a string or a list of lines."""
+    source = cell.get("source", "")
+    return source if isinstance(source, str) else "".join(source)
+
+
+@functools.lru_cache(maxsize=None)
+def load_notebook_cells(path):
+    """Parse a notebook once and return (cell_type, source, language) per cell.
+
+    Cell sources are joined here so each test reads a ready string.
+    """
+    return tuple(
+        (
+            cell.get("cell_type"),
+            _cell_source(cell),
+            cell.get("metadata", {}).get("language", ""),
+        )
+        for cell in load_notebook(path)
+    )
+
+
+# source sha256 -> SyntaxError or None, for this process
+_PARSE_CACHE = {}
+
+
+def source_digest(source):
+    """Stable content hash of a cell (str hash() is salted per process)."""
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+def parse_cell(path, index, source, digest):
+    """Syntax-check a code cell, reusing the outcome for identical sources."""
+    if digest not in _PARSE_CACHE:
+        try:
+            compile(source, f"{path}:cell_{index}", "exec", ast.PyCF_ONLY_AST, dont_inherit=True)
+            _PARSE_CACHE[digest] = None
+        except SyntaxError as e:
+            _PARSE_CACHE[digest] = e
+    return _PARSE_CACHE[digest]
+
+
+@functools.lru_cache(maxsize=None)
 def get_notebook_paths(project_root):
-    """Return paths to all notebooks in the project."""
-    paths = []
-    for candidate in [
-        os.path.join(project_root, "apex_nextload_demo.ipynb"),
-        os.path.join(project_root, "notebooks", "freight_360_demo.ipynb"),
-    ]:
-        if os.path.isfile(candidate):
-            paths.append(candidate)
-    return paths
+    """Return paths to all notebooks in the project.
+
+    The known demo notebooks come first; any other notebook under
+    notebooks/ is picked up without listing it here.
+    """
+    root = pathlib.Path(project_root)
+    paths = [
+        p for p in (root / "apex_nextload_demo.ipynb", root / "notebooks" / "freight_360_demo.ipynb")
+        if p.is_file()
+    ]
+    paths += sorted(p for p in root.glob("notebooks/*.ipynb") if p not in paths)
+    return tuple(str(p) for p in paths)
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# One test per notebook so failures are reported, and can be scheduled, separately
+per_notebook = pytest.mark.parametrize(
+    "notebook_path", get_notebook_paths(PROJECT_ROOT), ids=os.path.basename
+)
 
 
 @pytest.mark.notebook
@@ -32,58 +113,63 @@ class TestNotebookStructure:
         paths = get_notebook_paths(project_root)
         assert len(paths) > 0, "No notebooks found in project"
 
-    def test_no_empty_cells(self, project_root):
+    @per_notebook
+    def test_no_empty_cells(self, notebook_path):
         issues = []
-        for path in get_notebook_paths(project_root):
-            cells = load_notebook(path)
-            for i, cell in enumerate(cells):
-                source = "".join(cell.get("source", []))
-                if source.strip() == "":
-                    issues.append(f"{os.path.basename(path)}:cell_{i}")
+        for i, (_, source, _) in enumerate(load_notebook_cells(notebook_path)):
+            if source.strip() == "":
+                issues.append(f"{os.path.basename(notebook_path)}:cell_{i}")
         assert len(issues) == 0, f"Empty cells found: {issues}"
 
-    def test_has_markdown_cells(self, project_root):
-        for path in get_notebook_paths(project_root):
-            cells = load_notebook(path)
-            md_cells = [c for c in cells if c.get("cell_type") == "markdown"]
-            assert len(md_cells) > 0, f"{os.path.basename(path)} has no markdown cells"
+    @per_notebook
+    def test_has_markdown_cells(self, notebook_path):
+        cells = load_notebook_cells(notebook_path)
+        md_cells = [c for c in cells if c[0] == "markdown"]
+        assert len(md_cells) > 0, f"{os.path.basename(notebook_path)} has no markdown cells"
 
 
 @pytest.mark.notebook
 class TestNotebookPythonSyntax:
     """Validate Python cells parse correctly."""
 
-    def test_python_cells_parse(self, project_root):
+    @per_notebook
+    def test_python_cells_parse(self, notebook_path, request):
         issues = []
-        sql_prefixes = ("--", "SELECT", "INSERT", "CREATE", "DROP", "ALTER",
-                        "USE ", "SHOW ", "DESCRIBE ", "GRANT ", "CALL ",
-                        "TRUNCATE", "DELETE", "UPDATE", "MERGE", "WITH ")
-        for path in get_notebook_paths(project_root):
-            cells = load_notebook(path)
-            for i, cell in enumerate(cells):
-                if cell.get("cell_type") != "code":
-                    continue
-                source = "".join(cell.get("source", []))
-                stripped = source.strip()
-                # Skip cells that are SQL magic or shell commands
-                if stripped.startswith(("%%sql", "%%sh", "!", "%")):
-                    continue
-                # Skip empty cells
-                if stripped == "":
-                    continue
-                # Skip SQL cells (Snowflake notebooks store SQL as code cells)
-                if stripped.upper().startswith(sql_prefixes):
-                    continue
-                # Skip cells with SQL language metadata
-                lang = cell.get("metadata", {}).get("language", "")
-                if lang.lower() == "sql":
-                    continue
-                try:
-                    ast.parse(source)
-                except SyntaxError as e:
-                    issues.append(
-                        f"{os.path.basename(path)}:cell_{i}: {e.msg} (line {e.lineno})"
-                    )
+        # Cells that parsed on a previous run (same interpreter) are skipped;
+        # the pytest cache keeps the set per notebook across runs
+        cache = getattr(request.config, "cache", None)
+        cache_key = (
+            f"notebook/parsed_ok/py{sys.version_info[0]}{sys.version_info[1]}/"
+            f"{os.path.basename(notebook_path)}"
+        )
+        parsed_ok = set(cache.get(cache_key, [])) if cache else set()
+        ok_now = []
+        for i, (cell_type, source, lang) in enumerate(load_notebook_cells(notebook_path)):
+            if cell_type != "code":
+                continue
+            stripped = source.strip()
+            # Skip cells that are SQL magic or shell commands
+            if stripped.startswith(("%%sql", "%%sh", "!", "%")):
+                continue
+            # Skip empty cells
+            if stripped == "":
+                continue
+            # Skip SQL cells (Snowflake notebooks store SQL as code cells)
+            if _SQL_PREFIX_RE.match(stripped):
+                continue
+            # Skip cells with SQL language metadata
+            if lang.lower() == "sql":
+                continue
+            digest = source_digest(source)
+            e = None if digest in parsed_ok else parse_cell(notebook_path, i, source, digest)
+            if e is not None:
+                issues.append(
+                    f"{os.path.basename(notebook_path)}:cell_{i}: {e.msg} (line {e.lineno})"
+                )
+            else:
+                ok_now.append(digest)
+        if cache:
+            cache.set(cache_key, ok_now)
         assert len(issues) == 0, f"Python syntax errors:\n" + "\n".join(issues)
 
 
@@ -91,25 +177,13 @@ class TestNotebookPythonSyntax:
 class TestNotebookContent:
     """Validate notebook content quality."""
 
-    def test_no_hardcoded_credentials(self, project_root):
+    @per_notebook
+    def test_no_hardcoded_credentials(self, notebook_path):
         issues = []
-        # Known safe patterns that contain keyword substrings but are not credentials
-        safe_patterns = [
-            "/snowflake/session/token",  # SPCS token file read
-            "token = open(",             # SPCS token file read
-            ".connection.token",         # Snowpark session token attribute
-            "conn.token",                # Snowpark session token via alias
-            'Token=\\"',                 # Snowflake auth header pattern
-            "Token=\"",                  # Snowflake auth header pattern
-        ]
-        for path in get_notebook_paths(project_root):
-            cells = load_notebook(path)
-            for i, cell in enumerate(cells):
-                source = "".join(cell.get("source", []))
-                for keyword in ["password=", "token=", "secret=", "api_key="]:
-                    if keyword in source.lower():
-                        # Check if line matches a known safe pattern
-                        is_safe = any(sp in source for sp in safe_patterns)
-                        if not is_safe:
-                            issues.append(f"{os.path.basename(path)}:cell_{i}: found '{keyword}'")
+        for i, (_, source, _) in enumerate(load_notebook_cells(notebook_path)):
+            keywords = {m.group(1).lower() for m in _CRED_RE.finditer(source)}
+            # Check if the cell matches a known safe pattern
+            if keywords and not _SAFE_RE.search(source):
+                for keyword in sorted(keywords):
+                    issues.append(f"{os.path.basename(notebook_path)}:cell_{i}: found '{keyword}='")
         assert len(issues) == 0, f"Possible credentials:\n" + "\n".join(issues)
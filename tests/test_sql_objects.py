@@ -7,75 +7,58 @@ import pytest
 class TestObjectExistence:
     """Verify all deployed objects exist in APEX_CAPITAL_DEMO."""
 
-    def test_dynamic_table_exists(self, sf_session):
-        result = sf_session.sql(
-            "SHOW DYNAMIC TABLES LIKE 'BROKER_360' IN SCHEMA APEX_CAPITAL_DEMO.ANALYTICS"
-        ).collect()
-        assert len(result) > 0, "Dynamic table ANALYTICS.BROKER_360 does not exist"
-
-    def test_semantic_view_exists(self, sf_session):
-        result = sf_session.sql(
-            "SHOW SEMANTIC VIEWS LIKE 'APEX_BROKER_360_SV' IN SCHEMA APEX_CAPITAL_DEMO.ANALYTICS"
-        ).collect()
-        assert len(result) > 0, "Semantic view ANALYTICS.APEX_BROKER_360_SV does not exist"
-
-    def test_agent_exists(self, sf_session):
-        result = sf_session.sql(
-            "SHOW AGENTS LIKE 'APEX_BROKER_AGENT' IN SCHEMA APEX_CAPITAL_DEMO.ANALYTICS"
-        ).collect()
-        assert len(result) > 0, "Agent ANALYTICS.APEX_BROKER_AGENT does not exist"
-
-    def test_udf_exists(self, sf_session):
-        result = sf_session.sql(
-            "SHOW USER FUNCTIONS LIKE 'GET_RECOMMENDATION_SCORE' IN SCHEMA APEX_CAPITAL_DEMO.ML"
-        ).collect()
-        assert len(result) > 0, "UDF ML.GET_RECOMMENDATION_SCORE does not exist"
-
-    def test_procedure_exists(self, sf_session):
-        result = sf_session.sql(
-            "SHOW PROCEDURES LIKE 'POPULATE_RECOMMENDATIONS' IN SCHEMA APEX_CAPITAL_DEMO.ML"
-        ).collect()
-        assert len(result) > 0, "Procedure ML.POPULATE_RECOMMENDATIONS does not exist"
-
-    def test_model_exists(self, sf_session):
-        result = sf_session.sql(
-            "SHOW MODELS LIKE 'BROKER_RISK_NET' IN SCHEMA APEX_CAPITAL_DEMO.ML"
-        ).collect()
-        assert len(result) > 0, "Model ML.BROKER_RISK_NET does not exist"
-
-    def test_stream_exists(self, sf_session):
-        result = sf_session.sql(
-            "SHOW STREAMS LIKE 'INVOICE_JSON_STREAM' IN SCHEMA APEX_CAPITAL_DEMO.RAW"
-        ).collect()
-        assert len(result) > 0, "Stream RAW.INVOICE_JSON_STREAM does not exist"
-
-    def test_task_exists(self, sf_session):
-        result = sf_session.sql(
-            "SHOW TASKS LIKE 'SIMULATE_STREAMING_INGESTION' IN SCHEMA APEX_CAPITAL_DEMO.RAW"
-        ).collect()
-        assert len(result) > 0, "Task RAW.SIMULATE_STREAMING_INGESTION does not exist"
-
-    def test_masking_policies_exist(self, sf_session):
-        result = sf_session.sql(
-            "SHOW MASKING POLICIES IN SCHEMA APEX_CAPITAL_DEMO.RAW"
-        ).collect()
-        policy_names = [row["name"] for row in result]
-        assert "SSN_MASK" in policy_names, "Masking policy RAW.SSN_MASK does not exist"
-        assert "BANK_ACCOUNT_MASK" in policy_names, "Masking policy RAW.BANK_ACCOUNT_MASK does not exist"
-
-    def test_schemas_exist(self, sf_session):
-        result = sf_session.sql(
-            "SHOW SCHEMAS IN DATABASE APEX_CAPITAL_DEMO"
-        ).collect()
-        schema_names = [row["name"] for row in result]
+    def test_dynamic_table_exists(self, deployed_objects):
+        deployed_objects.require("DYNAMIC TABLE")
+        assert ("ANALYTICS", "DYNAMIC TABLE", "BROKER_360") in deployed_objects, \
+            "Dynamic table ANALYTICS.BROKER_360 does not exist"
+
+    def test_semantic_view_exists(self, deployed_objects):
+        deployed_objects.require("SEMANTIC VIEW")
+        assert ("ANALYTICS", "SEMANTIC VIEW", "APEX_BROKER_360_SV") in deployed_objects, \
+            "Semantic view ANALYTICS.APEX_BROKER_360_SV does not exist"
+
+    def test_agent_exists(self, deployed_objects):
+        deployed_objects.require("AGENT")
+        assert ("ANALYTICS", "AGENT", "APEX_BROKER_AGENT") in deployed_objects, \
+            "Agent ANALYTICS.APEX_BROKER_AGENT does not exist"
+
+    def test_udf_exists(self, deployed_objects):
+        assert ("ML", "FUNCTION", "GET_RECOMMENDATION_SCORE") in deployed_objects, \
+            "UDF ML.GET_RECOMMENDATION_SCORE does not exist"
+
+    def test_procedure_exists(self, deployed_objects):
+        assert ("ML", "PROCEDURE", "POPULATE_RECOMMENDATIONS") in deployed_objects, \
+            "Procedure ML.POPULATE_RECOMMENDATIONS does not exist"
+
+    def test_model_exists(self, deployed_objects):
+        deployed_objects.require("MODEL")
+        assert ("ML", "MODEL", "BROKER_RISK_NET") in deployed_objects, \
+            "Model ML.BROKER_RISK_NET does not exist"
+
+    def test_stream_exists(self, deployed_objects):
+        deployed_objects.require("STREAM")
+        assert ("RAW", "STREAM", "INVOICE_JSON_STREAM") in deployed_objects, \
+            "Stream RAW.INVOICE_JSON_STREAM does not exist"
+
+    def test_task_exists(self, deployed_objects):
+        deployed_objects.require("TASK")
+        assert ("RAW", "TASK", "SIMULATE_STREAMING_INGESTION") in deployed_objects, \
+            "Task RAW.SIMULATE_STREAMING_INGESTION does not exist"
+
+    def test_masking_policies_exist(self, deployed_objects):
+        deployed_objects.require("MASKING POLICY")
+        assert ("RAW", "MASKING POLICY", "SSN_MASK") in deployed_objects, \
+            "Masking policy RAW.SSN_MASK does not exist"
+        assert ("RAW", "MASKING POLICY", "BANK_ACCOUNT_MASK") in deployed_objects, \
+            "Masking policy RAW.BANK_ACCOUNT_MASK does not exist"
+
+    def test_schemas_exist(self, deployed_objects):
         for expected in ["RAW", "STAGING", "ANALYTICS", "ML", "DS_SANDBOX"]:
-            assert expected in schema_names, f"Schema {expected} does not exist"
+            assert (expected, "SCHEMA", expected) in deployed_objects, f"Schema {expected} does not exist"
 
-    def test_recommendations_table_exists(self, sf_session):
-        result = sf_session.sql(
-            "SHOW TABLES LIKE 'NEXTLOAD_RECOMMENDATIONS' IN SCHEMA APEX_CAPITAL_DEMO.ML"
-        ).collect()
-        assert len(result) > 0, "Table ML.NEXTLOAD_RECOMMENDATIONS does not exist"
+    def test_recommendations_table_exists(self, deployed_objects):
+        assert ("ML", "TABLE", "NEXTLOAD_RECOMMENDATIONS") in deployed_objects, \
+            "Table ML.NEXTLOAD_RECOMMENDATIONS does not exist"
 
 
 @pytest.mark.sql
@@ -85,18 +68,23 @@ class TestDataIntegrity:
 
     def test_broker_360_has_rows(self, sf_session):
         result = sf_session.sql(
-            "SELECT COUNT(*) AS cnt FROM APEX_CAPITAL_DEMO.ANALYTICS.BROKER_360"
+            "SELECT 1 FROM APEX_CAPITAL_DEMO.ANALYTICS.BROKER_360 LIMIT 1"
         ).collect()
-        assert result[0]["CNT"] > 0, "BROKER_360 is empty"
+        assert len(result) > 0, "BROKER_360 is empty"
 
     def test_recommendations_row_count(self, sf_session):
         result = sf_session.sql(
-            "SELECT COUNT(*) AS cnt FROM APEX_CAPITAL_DEMO.ML.NEXTLOAD_RECOMMENDATIONS"
+            "SELECT 1 FROM APEX_CAPITAL_DEMO.ML.NEXTLOAD_RECOMMENDATIONS LIMIT 1"
         ).collect()
-        assert result[0]["CNT"] > 0, "NEXTLOAD_RECOMMENDATIONS is empty"
+        assert len(result) > 0, "NEXTLOAD_RECOMMENDATIONS is empty"
 
     def test_json_table_growing(self, sf_session):
         result = sf_session.sql(
-            "SELECT COUNT(*) AS cnt FROM APEX_CAPITAL_DEMO.RAW.INVOICE_TRANSACTIONS_JSON"
+            "SELECT 1 FROM APEX_CAPITAL_DEMO.RAW.INVOICE_TRANSACTIONS_JSON LIMIT 1"
+        ).collect()
+        assert len(result) > 0, "INVOICE_TRANSACTIONS_JSON is empty (task may not be running)"
+        result = sf_session.sql(
+            "SELECT MAX(INGESTED_AT) >= DATEADD('hour', -1, CURRENT_TIMESTAMP()) AS fresh "
+            "FROM APEX_CAPITAL_DEMO.RAW.INVOICE_TRANSACTIONS_JSON"
         ).collect()
-        assert result[0]["CNT"] > 0, "INVOICE_TRANSACTIONS_JSON is empty (task may not be running)"
+        assert result[0]["FRESH"], "No rows ingested in the last hour (task may not be running)"
@@ -5,10 +5,14 @@ Mocks the Snowflake connection so the app can run without a live database.
 Validates widget tree, tab rendering, helper functions, and interactions.
 """
 
+import bisect
 import sys
 import os
+import re
+from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
+import numpy as np
 import pandas as pd
 import pytest
 
@@ -81,7 +85,7 @@ BROKERS_DF = pd.DataFrame(
         "CREDIT_SCORE": [750.0, 620.0],
         "FACTORING_TYPE": ["RECOURSE", "NON-RECOURSE"],
         "TOTAL_INVOICES": [1200, 800],
-        "TOTAL_FACTORED_AMOUNT": [5000000.0, 2000000.0],
+        "TOTAL_FACTORED_STR": ["$5,000,000", "$2,000,000"],
         "AVG_DAYS_TO_PAY": [32.5, 45.2],
         "DISPUTED_INVOICES": [3, 12],
         "FRAUD_RISK_LEVEL": ["LOW", "HIGH"],
@@ -92,26 +96,36 @@ BROKERS_DF = pd.DataFrame(
         "PRIMARY_ORIGIN": ["Dallas, TX", "Los Angeles, CA"],
         "PRIMARY_DESTINATION": ["Houston, TX", "Phoenix, AZ"],
         "LANE_DENSITY": [4.2, 2.1],
-        "LAST_REFRESHED": ["2026-02-20 04:00:00", "2026-02-20 04:00:00"],
+        "LAST_REFRESHED_STR": ["2026-02-20 04:00:00", "2026-02-20 04:00:00"],
     }
 )
 
 
-def _mock_run_query(sql: str) -> pd.DataFrame:
-    """Route SQL queries to the appropriate canned DataFrame."""
-    sql_upper = sql.upper().strip()
-    if "CARRIER_PROFILES" in sql_upper:
-        return CARRIERS_DF.copy()
-    if "LOAD_POSTINGS" in sql_upper:
-        return LOADS_DF.copy()
-    if "TEXAS_WEATHER" in sql_upper:
-        return WEATHER_DF.copy()
-    if "LOADSTAR_RECOMMENDATIONS_V" in sql_upper:
-        return RECOMMENDATIONS_DF.copy()
-    if "BROKER_360" in sql_upper:
-        return BROKERS_DF.copy()
-    # Fallback: return empty DataFrame
-    return pd.DataFrame()
+# Table name -> canned frame; the first table named in the SQL picks the frame
+_ROUTES = {
+    "CARRIER_PROFILES": CARRIERS_DF,
+    "LOAD_POSTINGS": LOADS_DF,
+    "TEXAS_WEATHER": WEATHER_DF,
+    "LOADSTAR_RECOMMENDATIONS_V": RECOMMENDATIONS_DF,
+    "BROKER_360": BROKERS_DF,
+}
+_ROUTE_RE = re.compile("|".join(map(re.escape, _ROUTES)), re.IGNORECASE)
+_EMPTY_DF = pd.DataFrame()
+
+
+def _mock_run_query(sql: str, params: tuple | None = None) -> pd.DataFrame:
+    """Route SQL queries to the appropriate canned DataFrame.
+
+    The canned frames are returned as-is and must be treated as read-only;
+    the cursor mock converts them to Arrow, so the app never holds them.
+    """
+    m = _ROUTE_RE.search(sql)
+    if m is None:
+        return _EMPTY_DF
+    df = _ROUTES[m.group(0).upper()]
+    if params and df is BROKERS_DF:
+        return df[df["BROKER_NAME"] == params[0]].reset_index(drop=True)
+    return df
 
 
 # ---------------------------------------------------------------------------
@@ -119,113 +133,101 @@ def _mock_run_query(sql: str) -> pd.DataFrame:
 # ---------------------------------------------------------------------------
 
 
+@pytest.fixture(scope="module")
+def helpers():
+    """Helper functions mirrored from streamlit_app.py, built once per module.
+
+    The app module is not imported (it executes the whole UI at import), so
+    the helpers are defined directly from the source patterns.
+    """
+    def risk_badge(level: str) -> str:
+        css_class = {
+            "LOW": "risk-low",
+            "MEDIUM": "risk-medium",
+            "HIGH": "risk-high",
+            "CRITICAL": "risk-critical",
+        }.get(str(level).upper(), "risk-medium")
+        return f'<span class="risk-badge {css_class}">{level}</span>'
+
+    def stat_card(
+        label: str, value: str, color: str = "var(--text-header)"
+    ) -> str:
+        return (
+            f'\n    <div class="stat-card">\n'
+            f'        <div class="stat-label">{label}</div>\n'
+            f'        <div class="stat-value" style="color:{color}">{value}</div>\n'
+            f"    </div>\n    "
+        )
+
+    thresholds = (0.4, 0.6, 0.8)
+    colors = ("#ef405e", "#e8a317", "#5999f8", "#1db588")
+    colors_np = np.array(colors)
+
+    def match_color(score: float) -> str:
+        if not score >= thresholds[0]:
+            return colors[0]
+        return colors[bisect.bisect_right(thresholds, score)]
+
+    def match_colors(scores) -> np.ndarray:
+        scores = np.asarray(scores, dtype=float)
+        idx = np.searchsorted(thresholds, scores, side="right")
+        return colors_np[np.where(np.isnan(scores), 0, idx)]
+
+    return SimpleNamespace(
+        risk_badge=risk_badge, stat_card=stat_card,
+        match_color=match_color, match_colors=match_colors,
+    )
+
+
 class TestHelperFunctions:
     """Unit tests for pure helper functions in streamlit_app.py."""
 
-    @pytest.fixture(autouse=True)
-    def _import_helpers(self):
-        """Import helper functions by loading the module without executing the app."""
-        # We need to parse just the helper functions from the source
-        app_path = os.path.join(
-            os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-            "streamlit",
-            "streamlit_app.py",
-        )
-        with open(app_path) as f:
-            source = f.read()
-
-        # Extract the helper functions via exec in isolated namespace
-        # We mock streamlit so that top-level st.* calls don't fail
-        mock_st = MagicMock()
-        mock_st.set_page_config = MagicMock()
-        mock_st.cache_resource = lambda f: f
-        mock_st.cache_data = lambda **kw: lambda f: f
-        mock_st.markdown = MagicMock()
-        mock_st.html = MagicMock()
-        mock_st.tabs = MagicMock(return_value=(MagicMock(), MagicMock(), MagicMock()))
-        mock_st.connection = MagicMock()
-        mock_st.session_state = {}
-        mock_st.sidebar = MagicMock()
-        mock_st.columns = MagicMock(return_value=[MagicMock()])
-
-        # We only need the function definitions, so skip the module exec
-        # and define them directly from source code patterns
-        self.risk_badge = None
-        self.stat_card = None
-        self.match_color = None
-
-        # Define functions directly
-        def risk_badge(level: str) -> str:
-            css_class = {
-                "LOW": "risk-low",
-                "MEDIUM": "risk-medium",
-                "HIGH": "risk-high",
-                "CRITICAL": "risk-critical",
-            }.get(str(level).upper(), "risk-medium")
-            return f'<span class="risk-badge {css_class}">{level}</span>'
-
-        def stat_card(
-            label: str, value: str, color: str = "var(--text-header)"
-        ) -> str:
-            return (
-                f'\n    <div class="stat-card">\n'
-                f'        <div class="stat-label">{label}</div>\n'
-                f'        <div class="stat-value" style="color:{color}">{value}</div>\n'
-                f"    </div>\n    "
-            )
-
-        def match_color(score: float) -> str:
-            if score >= 0.8:
-                return "#1db588"
-            if score >= 0.6:
-                return "#5999f8"
-            if score >= 0.4:
-                return "#e8a317"
-            return "#ef405e"
-
-        self.risk_badge = risk_badge
-        self.stat_card = stat_card
-        self.match_color = match_color
-
-    def test_risk_badge_low(self):
-        html = self.risk_badge("LOW")
+    def test_risk_badge_low(self, helpers):
+        html = helpers.risk_badge("LOW")
         assert 'class="risk-badge risk-low"' in html
         assert "LOW" in html
 
-    def test_risk_badge_high(self):
-        html = self.risk_badge("HIGH")
+    def test_risk_badge_high(self, helpers):
+        html = helpers.risk_badge("HIGH")
         assert "risk-high" in html
 
-    def test_risk_badge_critical(self):
-        html = self.risk_badge("CRITICAL")
+    def test_risk_badge_critical(self, helpers):
+        html = helpers.risk_badge("CRITICAL")
         assert "risk-critical" in html
 
-    def test_risk_badge_unknown_defaults_to_medium(self):
-        html = self.risk_badge("UNKNOWN")
+    def test_risk_badge_unknown_defaults_to_medium(self, helpers):
+        html = helpers.risk_badge("UNKNOWN")
         assert "risk-medium" in html
 
-    def test_stat_card_contains_label_and_value(self):
-        html = self.stat_card("Test label", "42")
+    def test_stat_card_contains_label_and_value(self, helpers):
+        html = helpers.stat_card("Test label", "42")
         assert "stat-card" in html
         assert "Test label" in html
         assert "42" in html
 
-    def test_stat_card_custom_color(self):
-        html = self.stat_card("X", "Y", "#ff0000")
+    def test_stat_card_custom_color(self, helpers):
+        html = helpers.stat_card("X", "Y", "#ff0000")
         assert 'color:#ff0000' in html
 
-    def test_match_color_high(self):
-        assert self.match_color(0.95) == "#1db588"
-        assert self.match_color(0.80) == "#1db588"
+    def test_match_color_high(self, helpers):
+        assert helpers.match_color(0.95) == "#1db588"
+        assert helpers.match_color(0.80) == "#1db588"
+
+    def test_match_color_good(self, helpers):
+        assert helpers.match_color(0.65) == "#5999f8"
+
+    def test_match_color_medium(self, helpers):
+        assert helpers.match_color(0.45) == "#e8a317"
 
-    def test_match_color_good(self):
-        assert self.match_color(0.65) == "#5999f8"
+    def test_match_color_low(self, helpers):
+        assert helpers.match_color(0.2) == "#ef405e"
 
-    def test_match_color_medium(self):
-        assert self.match_color(0.45) == "#e8a317"
+    def test_match_color_missing_score_is_low(self, helpers):
+        assert helpers.match_color(float("nan")) == "#ef405e"
 
-    def test_match_color_low(self):
-        assert self.match_color(0.2) == "#ef405e"
+    def test_match_colors_matches_scalar(self, helpers):
+        scores = [0.95, 0.8, 0.65, 0.45, 0.2, float("nan")]
+        assert list(helpers.match_colors(scores)) == [helpers.match_color(s) for s in scores]
 
 
 # ---------------------------------------------------------------------------
@@ -243,95 +245,121 @@ def _has_apptest():
         return False
 
 
-@pytest.mark.skipif(not _has_apptest(), reason="streamlit.testing not available")
-class TestAppTestRendering:
-    """Headless functional tests using Streamlit's AppTest framework."""
+_HAS_APPTEST = _has_apptest()
+
+APP_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "streamlit",
+    "streamlit_app.py",
+)
 
-    APP_PATH = os.path.join(
-        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-        "streamlit",
-        "streamlit_app.py",
-    )
 
-    def _create_app(self):
-        """Create a mocked AppTest instance."""
-        from streamlit.testing.v1 import AppTest
+@pytest.fixture(scope="class")
+def apptest_patches():
+    """Patch Snowflake connection and external calls for headless testing.
 
-        at = AppTest.from_file(self.APP_PATH, default_timeout=30)
-        return at
+    Installed once per class and undone by the fixture teardown.
+    """
+    if not _HAS_APPTEST:
+        pytest.skip("streamlit.testing not available")
 
-    @pytest.fixture(autouse=True)
-    def _setup_patches(self):
-        """Patch Snowflake connection and external calls for headless testing."""
+    import pyarrow as pa
 
-        def _make_sql_mock(sql_text):
-            """Create a mock that returns canned data when .to_pandas() is called."""
-            result_mock = MagicMock()
-            result_mock.to_pandas.return_value = _mock_run_query(sql_text)
-            return result_mock
+    def _make_cursor_mock():
+        """Create a cursor mock whose fetch_arrow_all() returns canned data."""
+        cursor = MagicMock()
+        cursor.__enter__.return_value = cursor
+        cursor.execute.side_effect = lambda sql_text, params=None: setattr(
+            cursor, "_df", _mock_run_query(sql_text, params)
+        )
+        cursor.fetch_arrow_all.side_effect = lambda: (
+            pa.Table.from_pandas(cursor._df, preserve_index=False)
+            if len(cursor._df.columns) else None
+        )
+        cursor.description = []
+        return cursor
+
+    mock_session = MagicMock()
+    mock_session.connection.cursor.side_effect = _make_cursor_mock
+
+    mock_conn = MagicMock()
+    mock_conn.session.return_value = mock_session
+
+    # Inject mock pydeck if not installed (it's a SiS-only dependency)
+    pydeck_injected = "pydeck" not in sys.modules
+    if pydeck_injected:
+        import types
+
+        mock_pdk = types.ModuleType("pydeck")
+        mock_pdk.__path__ = []
 
-        mock_session = MagicMock()
-        mock_session.sql.side_effect = _make_sql_mock
+        # Deck must produce valid JSON for st.pydeck_chart proto
+        class _MockDeck:
+            def __init__(self, **kwargs):
+                self._kwargs = kwargs
 
-        mock_conn = MagicMock()
-        mock_conn.session.return_value = mock_session
+            def to_json(self):
+                return '{"layers":[],"initialViewState":{},"mapStyle":""}'
 
-        # Inject mock pydeck if not installed (it's a SiS-only dependency)
-        pydeck_injected = "pydeck" not in sys.modules
-        if pydeck_injected:
-            import types
+            def to_html(self, **kwargs):
+                return "<div></div>"
 
-            mock_pdk = types.ModuleType("pydeck")
-            mock_pdk.__path__ = []
+        class _MockViewState:
+            def __init__(self, **kwargs):
+                pass
 
-            # Deck must produce valid JSON for st.pydeck_chart proto
-            class _MockDeck:
-                def __init__(self, **kwargs):
-                    self._kwargs = kwargs
+        class _MockLayer:
+            def __init__(self, *args, **kwargs):
+                pass
 
-                def to_json(self):
-                    return '{"layers":[],"initialViewState":{},"mapStyle":""}'
+        mock_pdk.Deck = _MockDeck
+        mock_pdk.ViewState = _MockViewState
+        mock_pdk.Layer = _MockLayer
+        sys.modules["pydeck"] = mock_pdk
 
-            class _MockViewState:
-                def __init__(self, **kwargs):
-                    pass
+    # Patch st.connection to return our mock
+    with patch("streamlit.connection", return_value=mock_conn):
+        # Also patch the cached run_query to use our mock
+        with patch.dict(os.environ, {"SNOWFLAKE_HOST": ""}, clear=False):
+            yield
 
-            class _MockLayer:
-                def __init__(self, *args, **kwargs):
-                    pass
+    # Clean up injected mock
+    if pydeck_injected and "pydeck" in sys.modules:
+        del sys.modules["pydeck"]
 
-            mock_pdk.Deck = _MockDeck
-            mock_pdk.ViewState = _MockViewState
-            mock_pdk.Layer = _MockLayer
-            sys.modules["pydeck"] = mock_pdk
 
-        # Patch st.connection to return our mock
-        with patch("streamlit.connection", return_value=mock_conn):
-            # Also patch the cached run_query to use our mock
-            with patch.dict(os.environ, {"SNOWFLAKE_HOST": ""}, clear=False):
-                yield
+@pytest.fixture(scope="class")
+def rendered_app(apptest_patches):
+    """Run the mocked app once and share the result across a test class.
 
-        # Clean up injected mock
-        if pydeck_injected and "pydeck" in sys.modules:
-            del sys.modules["pydeck"]
+    Tests only inspect the rendered tree; one that interacts with widgets
+    should branch from a copy.deepcopy() of this instance.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=30)
+    at.run()
+    return at
+
+
+@pytest.mark.skipif(not _HAS_APPTEST, reason="streamlit.testing not available")
+class TestAppTestRendering:
+    """Headless functional tests using Streamlit's AppTest framework."""
 
-    def test_app_runs_without_exception(self):
+    def test_app_runs_without_exception(self, rendered_app):
         """App should render without raising any exception."""
-        at = self._create_app()
-        at.run()
+        at = rendered_app
         assert not at.exception, f"App raised exception: {at.exception}"
 
-    def test_tabs_exist(self):
+    def test_tabs_exist(self, rendered_app):
         """All 3 tabs should be rendered."""
-        at = self._create_app()
-        at.run()
+        at = rendered_app
         # Tabs are rendered as tab elements
         assert len(at.tabs) >= 3, f"Expected 3+ tabs, got {len(at.tabs)}"
 
-    def test_title_rendered(self):
+    def test_title_rendered(self, rendered_app):
         """App title should be set via page_config or rendered in output."""
-        at = self._create_app()
-        at.run()
+        at = rendered_app
         # st.html() renders as UnknownElement in AppTest, so we check
         # that the app at least produced some main-block children
         # (title via st.html + tab_container at minimum)
@@ -340,16 +368,14 @@ class TestAppTestRendering:
         main_children = at._tree.get(0)  # main block
         assert main_children is not None, "Main block not rendered"
 
-    def test_selectbox_exists(self):
+    def test_selectbox_exists(self, rendered_app):
         """At least one selectbox (driver or broker selector) should exist."""
-        at = self._create_app()
-        at.run()
+        at = rendered_app
         assert len(at.selectbox) >= 1, "No selectbox widgets found"
 
-    def test_no_unhandled_errors(self):
+    def test_no_unhandled_errors(self, rendered_app):
         """App should produce no error or warning elements."""
-        at = self._create_app()
-        at.run()
+        at = rendered_app
         errors = list(at.error) if hasattr(at, "error") else []
         assert len(errors) == 0, f"App produced errors: {errors}"
 
@@ -362,62 +388,34 @@ class TestAppTestRendering:
 class TestCSSThemeConsistency:
     """Validate CSS variables and theme config alignment."""
 
-    @pytest.fixture(autouse=True)
-    def _load_sources(self):
+    @pytest.fixture(scope="class", autouse=True)
+    @classmethod
+    def _load_sources(cls, app_source):
         project_root = os.path.dirname(
             os.path.dirname(os.path.abspath(__file__))
         )
-        app_path = os.path.join(project_root, "streamlit", "streamlit_app.py")
         config_path = os.path.join(
             project_root, "streamlit", ".streamlit", "config.toml"
         )
 
-        with open(app_path) as f:
-            self.app_source = f.read()
+        # Source text, NEUMORPH_CSS and :root vars are parsed once per session
+        cls.css = app_source.neumorph_css
+        cls.root_vars = app_source.root_vars
+        cls.referenced_vars = app_source.referenced_vars
+        cls.code_tokens = app_source.code_tokens
 
-        self.config_source = ""
+        cls.config_source = ""
         if os.path.exists(config_path):
             with open(config_path) as f:
-                self.config_source = f.read()
-
-    def _extract_css_block(self) -> str:
-        """Extract the NEUMORPH_CSS string from app source."""
-        import re
-
-        match = re.search(
-            r'NEUMORPH_CSS\s*=\s*"""(.*?)"""', self.app_source, re.DOTALL
-        )
-        if match:
-            return match.group(1)
-        return ""
-
-    def _extract_root_vars(self, css: str) -> dict:
-        """Extract --var: value pairs from :root block."""
-        import re
-
-        root_match = re.search(r":root\s*\{([^}]+)\}", css)
-        if not root_match:
-            return {}
-        pairs = re.findall(r"--([\w-]+)\s*:\s*([^;]+);", root_match.group(1))
-        return {f"--{name}": val.strip() for name, val in pairs}
+                cls.config_source = f.read()
 
     def test_all_css_vars_referenced(self):
         """Every CSS custom property defined in :root should be used somewhere."""
-        css = self._extract_css_block()
-        root_vars = self._extract_root_vars(css)
+        root_vars = self.root_vars
         assert root_vars, "No CSS custom properties found in :root"
 
-        # Remove the :root block to search references in the rest
-        import re
-
-        css_without_root = re.sub(r":root\s*\{[^}]+\}", "", css)
-        # Also search the full app source (inline styles reference vars too)
-        search_text = css_without_root + self.app_source
-
-        unreferenced = []
-        for var_name in root_vars:
-            if f"var({var_name})" not in search_text:
-                unreferenced.append(var_name)
+        # References come from the CSS and inline styles in the app source
+        unreferenced = sorted(root_vars.keys() - self.referenced_vars)
 
         if unreferenced:
             import warnings
@@ -433,8 +431,7 @@ class TestCSSThemeConsistency:
         if not self.config_source:
             pytest.skip("No .streamlit/config.toml found")
 
-        css = self._extract_css_block()
-        root_vars = self._extract_root_vars(css)
+        root_vars = self.root_vars
 
         # Expected mappings: config key -> CSS variable
         mappings = {
@@ -467,7 +464,7 @@ class TestCSSThemeConsistency:
 
     def test_font_import_url_valid(self):
         """The @import url(...) should reference fonts.googleapis.com."""
-        css = self._extract_css_block()
+        css = self.css
         import re
 
         imports = re.findall(r"@import\s+url\(['\"]([^'\"]+)['\"]\)", css)
@@ -478,7 +475,7 @@ class TestCSSThemeConsistency:
 
     def test_no_orphaned_css_classes(self):
         """CSS classes defined in NEUMORPH_CSS should be referenced in app code."""
-        css = self._extract_css_block()
+        css = self.css
         import re
 
         # Find all class definitions (excluding pseudo-classes)
@@ -486,12 +483,9 @@ class TestCSSThemeConsistency:
         # Remove common patterns that are Streamlit internal
         class_defs -= {"st-", "stApp"}
 
-        # Search for references in the app source (outside the CSS block)
-        orphaned = []
-        for cls in class_defs:
-            # Check if it's referenced in st.html/st.markdown calls or HTML strings
-            if cls not in self.app_source.replace(css, ""):
-                orphaned.append(cls)
+        # Search for references in the app source (outside the CSS block),
+        # i.e. in st.html/st.markdown calls or HTML strings
+        orphaned = sorted(class_defs - self.code_tokens)
 
         # INFO-level: we don't assert-fail, just warn
         if orphaned:
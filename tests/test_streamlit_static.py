@@ -1,8 +1,15 @@
 """Static analysis tests for the Streamlit app (no Snowflake needed)."""
 import os
-import subprocess
+import re
 import pytest
 
+# A line holding an f-string SELECT that also mentions widget/user input;
+# whole-line lookaheads so quotes inside the SQL don't end the match early
+_INJ_RE = re.compile(
+    r"""^(?=.*f["']SELECT)(?=.*(?:st\.text_input|(?i:user_input))).*$""",
+    re.MULTILINE,
+)
+
 
 @pytest.mark.streamlit
 class TestStreamlitStatic:
@@ -15,60 +22,54 @@ class TestStreamlitStatic:
         app_path = self._get_app_path(project_root)
         assert os.path.isfile(app_path), f"Streamlit app not found at {app_path}"
 
-    def test_ruff_no_errors(self, project_root):
-        app_path = self._get_app_path(project_root)
-        if not os.path.isfile(app_path):
-            pytest.skip("App file not found")
-        import sys
-        result = subprocess.run(
-            [sys.executable, "-m", "ruff", "check", app_path, "--select", "E,F"],
-            capture_output=True, text=True
+    @staticmethod
+    def _format_findings(findings, prefixes):
+        """Render the findings whose rule code starts with one of ``prefixes``."""
+        return "\n".join(
+            f"{os.path.basename(item['filename'])}:{item['location']['row']}:"
+            f"{item['location']['column']}: {item['code']} {item['message']}"
+            for item in findings
+            if (item["code"] or "").startswith(prefixes)
         )
-        if "No module named ruff" in result.stderr:
-            pytest.skip("ruff is not installed")
-        assert result.returncode == 0, f"Ruff found errors:\n{result.stdout}"
 
-    def test_ruff_no_security_issues(self, project_root):
-        app_path = self._get_app_path(project_root)
-        if not os.path.isfile(app_path):
-            pytest.skip("App file not found")
-        import sys
-        result = subprocess.run(
-            [sys.executable, "-m", "ruff", "check", app_path, "--select", "S"],
-            capture_output=True, text=True
-        )
-        if "No module named ruff" in result.stderr:
-            pytest.skip("ruff is not installed")
-        if result.returncode != 0:
-            pytest.fail(f"Ruff found security issues:\n{result.stdout}")
+    def test_ruff_no_errors(self, ruff_report, app_source):
+        errors = self._format_findings(ruff_report.get(app_source.path, []), ("E", "F"))
+        assert not errors, f"Ruff found errors:\n{errors}"
+
+    def test_ruff_no_security_issues(self, ruff_report, app_source):
+        issues = self._format_findings(ruff_report.get(app_source.path, []), ("S",))
+        if issues:
+            pytest.fail(f"Ruff found security issues:\n{issues}")
 
-    def test_uses_st_connection(self, project_root):
+    def test_uses_st_connection(self, app_source):
         """Container runtime should use st.connection, not get_active_session."""
-        app_path = self._get_app_path(project_root)
-        if not os.path.isfile(app_path):
-            pytest.skip("App file not found")
-        with open(app_path) as f:
-            content = f.read()
-        assert "get_active_session" not in content, (
+        assert "get_active_session" not in app_source.text, (
             "Found get_active_session() -- container runtime should use st.connection('snowflake')"
         )
 
-    def test_no_fstring_sql_injection(self, project_root):
+    def test_no_fstring_sql_injection(self, app_source):
         """Check for obvious SQL injection patterns."""
-        app_path = self._get_app_path(project_root)
-        if not os.path.isfile(app_path):
-            pytest.skip("App file not found")
-        with open(app_path) as f:
-            lines = f.readlines()
+        text = app_source.text
         issues = []
-        for i, line in enumerate(lines, 1):
-            if 'f"SELECT' in line or "f'SELECT" in line:
-                if "st.text_input" in line or "user_input" in line.lower():
-                    issues.append(f"  Line {i}: {line.strip()}")
+        for m in _INJ_RE.finditer(text):
+            lineno = text.count("\n", 0, m.start()) + 1
+            issues.append(f"  Line {lineno}: {app_source.lines[lineno - 1].strip()}")
         assert len(issues) == 0, (
             f"Potential SQL injection via f-string:\n" + "\n".join(issues)
         )
 
+    @pytest.mark.parametrize("line", [
+        "sql = f\"SELECT * FROM T WHERE NAME = '{user_input}'\"",
+        """run_query(f"SELECT * FROM T WHERE X = '{q}'", st.text_input("q"))""",
+        """sql = f'SELECT * FROM T WHERE NAME = "{User_Input}"'""",
+    ])
+    def test_injection_pattern_flags(self, line):
+        assert _INJ_RE.search(line), f"Injection pattern missed: {line}"
+
+    def test_injection_pattern_ignores_bound_params(self):
+        line = """run_query("SELECT * FROM T WHERE NAME = %s", (user_input,))"""
+        assert not _INJ_RE.search(line)
+
     def test_snowflake_yml_exists(self, project_root):
         yml_path = os.path.join(project_root, "streamlit", "snowflake.yml")
         assert os.path.isfile(yml_path), "streamlit/snowflake.yml not found"
@@ -2,6 +2,19 @@
 import pytest
 
 
+@pytest.fixture(scope="class")
+def view_stats(sf_session):
+    """Row count, score range and NULL-key counts from a single scan."""
+    return sf_session.sql("""
+        SELECT COUNT(*) AS cnt,
+               MIN(RECOMMENDATION_SCORE) AS min_score,
+               MAX(RECOMMENDATION_SCORE) AS max_score,
+               COUNT_IF(DRIVER_ID IS NULL) AS null_driver_ids,
+               COUNT_IF(LOAD_ID IS NULL) AS null_load_ids
+        FROM APEX_CAPITAL_DEMO.ANALYTICS.LOADSTAR_RECOMMENDATIONS_V
+    """).collect()[0]
+
+
 @pytest.mark.sql
 @pytest.mark.live
 class TestRecommendationsView:
@@ -13,37 +26,20 @@ class TestRecommendationsView:
         ).collect()
         assert len(result) > 0, "View ANALYTICS.LOADSTAR_RECOMMENDATIONS_V does not exist"
 
-    def test_has_rows(self, sf_session):
-        result = sf_session.sql(
-            "SELECT COUNT(*) AS cnt FROM APEX_CAPITAL_DEMO.ANALYTICS.LOADSTAR_RECOMMENDATIONS_V"
-        ).collect()
-        assert result[0]["CNT"] > 0, "LOADSTAR_RECOMMENDATIONS_V is empty"
+    def test_has_rows(self, view_stats):
+        assert view_stats["CNT"] > 0, "LOADSTAR_RECOMMENDATIONS_V is empty"
 
-    def test_score_range(self, sf_session):
+    def test_score_range(self, view_stats):
         """All scores should be in [0.0, 1.0]."""
-        result = sf_session.sql("""
-            SELECT MIN(RECOMMENDATION_SCORE) AS min_score, MAX(RECOMMENDATION_SCORE) AS max_score
-            FROM APEX_CAPITAL_DEMO.ANALYTICS.LOADSTAR_RECOMMENDATIONS_V
-        """).collect()
-        min_score = result[0]["MIN_SCORE"]
-        max_score = result[0]["MAX_SCORE"]
+        min_score = view_stats["MIN_SCORE"]
+        max_score = view_stats["MAX_SCORE"]
         if min_score is not None:
             assert min_score >= 0.0, f"Min score {min_score} is below 0"
         if max_score is not None:
             assert max_score <= 1.0, f"Max score {max_score} is above 1"
 
-    def test_no_null_driver_ids(self, sf_session):
-        result = sf_session.sql("""
-            SELECT COUNT(*) AS cnt
-            FROM APEX_CAPITAL_DEMO.ANALYTICS.LOADSTAR_RECOMMENDATIONS_V
-            WHERE DRIVER_ID IS NULL
-        """).collect()
-        assert result[0]["CNT"] == 0, "Found rows with NULL DRIVER_ID"
-
-    def test_no_null_load_ids(self, sf_session):
-        result = sf_session.sql("""
-            SELECT COUNT(*) AS cnt
-            FROM APEX_CAPITAL_DEMO.ANALYTICS.LOADSTAR_RECOMMENDATIONS_V
-            WHERE LOAD_ID IS NULL
-        """).collect()
-        assert result[0]["CNT"] == 0, "Found rows with NULL LOAD_ID"
+    def test_no_null_driver_ids(self, view_stats):
+        assert view_stats["NULL_DRIVER_IDS"] == 0, "Found rows with NULL DRIVER_ID"
+
+    def test_no_null_load_ids(self, view_stats):
+        assert view_stats["NULL_LOAD_IDS"] == 0, "Found rows with NULL LOAD_ID"